@@ -2,17 +2,42 @@
 ## about a specific stock, and returns structured insights like sentiment, keywords, and a summary — it’s the core 
 ## logic you’ll hand off to the backend teammate.
 
-import os
+import io
 import json
-import google.generativeai as genai
-from dotenv import load_dotenv
+import os
+from typing import Union
+from llm_gateway import gateway, INTERACTIVE, Priority
+from scripts.cancellation import Cancelled
+
+# --- 1. Gemini client, API key and call limits live in llm_gateway.py ---
+
+# Caps on article text sent to Gemini per prompt (bound both memory and input tokens). The block goes into
+# all three calls, so the defaults (~6k tokens per call) keep one analysis around 18k extra input tokens;
+# a short lede per scraped article leaves room for every headline rather than a few full bodies.
+PROMPT_ARTICLES_MAX_CHARS = int(os.getenv("PROMPT_ARTICLES_MAX_CHARS", "24000"))
+PROMPT_ARTICLE_TEXT_CHARS = int(os.getenv("PROMPT_ARTICLE_TEXT_CHARS", "400"))
+
+
+def build_articles_block(articles, max_chars: int = PROMPT_ARTICLES_MAX_CHARS) -> str:
+    """
+    Number and join articles into one block, streaming into a buffer and stopping at `max_chars`.
+    """
+    buf = io.StringIO()
+    for i, a in enumerate(articles):
+        # test_data.json carries "content"; scraped articles only have their fetched body in "text"
+        body = a.get("content") or (a.get("text") or "")[:PROMPT_ARTICLE_TEXT_CHARS]
+        line = f"{i+1}. {a.get('title', '')} — {body}\n"
+        remaining = max_chars - buf.tell()
+        if len(line) > remaining:
+            buf.write(line[:remaining])
+            break
+        buf.write(line)
+    return buf.getvalue()
 
-# --- 1. Load API key safely ---
-load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
 # --- 2. Define main analysis function ---
-def analyze_articles(data: dict) -> dict:
+def analyze_articles(data: dict, route: str = "/analyze", priority: Union[int, Priority] = INTERACTIVE,
+                     cancel=None) -> dict:
 
     ticker = data.get("ticker", "UNKNOWN")
     start_date = data.get("start_date", "N/A")
@@ -20,15 +45,8 @@ def analyze_articles(data: dict) -> dict:
     net_gain = data.get("net_gain", 0.0)
     articles = data.get("articles", [])
 
-    # Combine articles into readable format
-    combined_articles = [
-        f"{i+1}. {a.get('title', '')} — {a.get('content', '')}"
-        for i, a in enumerate(articles)
-    ]
-
-    joined_articles = "\n".join(combined_articles)
-
-    model = genai.GenerativeModel("gemini-2.5-flash")
+    # Combine articles into readable format, built once and shared by all three prompts
+    joined_articles = build_articles_block(articles)
 
     # --- Prompt 1: Big Idea Summary ---
     prompt_summary = f"""
@@ -43,7 +61,7 @@ def analyze_articles(data: dict) -> dict:
     of what it means in plain English. Focus on what’s happening in the real world,
     why people might be excited or worried, and what that means for {ticker} as a company.
 
-    Articles:{joined_articles}"""
+    Articles:"""
 
     # --- Prompt 2: Stock Movement Prediction ---
     prompt_prediction = f"""
@@ -52,7 +70,7 @@ def analyze_articles(data: dict) -> dict:
     Based ONLY on the tone, language, and overall context of these articles, predict whether the stock should 
     logically **increase** or **decrease** in value if investors were reacting purely to this news. Respond with ONLY one word: "increase" or "decrease".
    
-    Articles: {joined_articles}"""
+    Articles:"""
 
     # --- Prompt 3: Keyword Extraction ---
     prompt_keywords = f"""
@@ -61,13 +79,15 @@ def analyze_articles(data: dict) -> dict:
 
     Return the result as a numbered list of 10 concise keywords or phrases.
 
-    Articles:{joined_articles}"""
+    Articles:"""
 
     # --- Run all three prompts ---
     try:
-        summary_resp = model.generate_content(prompt_summary)
-        prediction_resp = model.generate_content(prompt_prediction)
-        keywords_resp = model.generate_content(prompt_keywords)
+        # Shared client, priority-queued and accounted per route by the gateway
+        # Articles go in as a second content part, so the block is never copied into each prompt
+        summary_resp = gateway.generate([prompt_summary, joined_articles], route=route, priority=priority, cancel=cancel)
+        prediction_resp = gateway.generate([prompt_prediction, joined_articles], route=route, priority=priority, cancel=cancel)
+        keywords_resp = gateway.generate([prompt_keywords, joined_articles], route=route, priority=priority, cancel=cancel)
 
         # Try to parse keywords into list
         raw_keywords = keywords_resp.text.strip().splitlines()
@@ -79,6 +99,8 @@ def analyze_articles(data: dict) -> dict:
             "keywords": keywords[:10]  # ensure max 10
         }
 
+    except Cancelled:
+        raise  # nobody is waiting for this result any more
     except Exception as e:
         result = {"error": str(e)}
 
@@ -0,0 +1,240 @@
+## cache.py provides the backend's cache backends (analysis results, search results, ticker metadata).
+## MemoryCache is per-process; SQLiteCache is a WAL-mode SQLite file shared by every worker on the host,
+## so adding uvicorn/gunicorn workers does not split the cache into cold copies.
+## Pick one with CACHE_BACKEND=memory|sqlite (default sqlite) and CACHE_PATH.
+
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+import orjson
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "sqlite").strip().lower()
+CACHE_PATH = os.getenv("CACHE_PATH", ".cache/nextcandle.sqlite3")
+
+
+class CacheBackend(ABC):
+    """
+    Namespaced key/value store with per-entry TTL. Values must be JSON-serializable.
+    """
+
+    def __init__(self, namespace: str, ttl: float, max_entries: int = 1024):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """
+        Set only if the key is absent (or expired); returns True if this call stored it.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def incr(self, key: str, delta: int = 1, ttl: Optional[float] = None) -> int:
+        """
+        Atomically add `delta` to an integer counter (created at 0 if absent or expired) and return
+        the new value. The TTL is set when the counter is created, not refreshed on every increment.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def has(self, key: str) -> bool:
+        """
+        Existence check that does not load or deserialize the value.
+        """
+        raise NotImplementedError
+
+    def __contains__(self, key: str) -> bool:
+        return self.has(key)
+
+
+class MemoryCache(CacheBackend):
+    def __init__(self, namespace: str, ttl: float, max_entries: int = 1024):
+        super().__init__(namespace, ttl, max_entries)
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_locked(self, key: str) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            return self._get_locked(key)
+
+    def _set_locked(self, key: str, value: Any, ttl: Optional[float]):
+        self._data[key] = (time.monotonic() + (ttl or self.ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)  # evict least recently used
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        with self._lock:
+            self._set_locked(key, value, ttl)
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        with self._lock:
+            if self._get_locked(key) is not None:
+                return False
+            self._set_locked(key, value, ttl)
+            return True
+
+    def incr(self, key: str, delta: int = 1, ttl: Optional[float] = None) -> int:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                self._set_locked(key, delta, ttl)
+                return delta
+            value = item[1] + delta
+            self._data[key] = (item[0], value)
+            self._data.move_to_end(key)
+            return value
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def has(self, key: str) -> bool:
+        with self._lock:
+            item = self._data.get(key)
+            return item is not None and item[0] >= time.monotonic()
+
+
+class SQLiteCache(CacheBackend):
+    PRUNE_EVERY = 100  # sets between expiry / size sweeps
+
+    def __init__(self, namespace: str, ttl: float, max_entries: int = 1024, path: str = CACHE_PATH):
+        super().__init__(namespace, ttl, max_entries)
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._sets = 0
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " ns TEXT NOT NULL, key TEXT NOT NULL, expires_at REAL NOT NULL, value BLOB NOT NULL,"
+                " PRIMARY KEY (ns, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_expiry ON cache (ns, expires_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections are per-thread; WAL lets every worker read while one writes
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        row = self._conn().execute(
+            "SELECT value FROM cache WHERE ns = ? AND key = ? AND expires_at > ?",
+            (self.namespace, key, time.time()),
+        ).fetchone()
+        return orjson.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (ns, key, expires_at, value) VALUES (?, ?, ?, ?)",
+                (self.namespace, key, time.time() + (ttl or self.ttl), orjson.dumps(value, default=str)),
+            )
+        self._maybe_prune()
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        now = time.time()
+        with self._conn() as conn:
+            cur = conn.execute(
+                "INSERT INTO cache (ns, key, expires_at, value) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (ns, key) DO UPDATE SET expires_at = excluded.expires_at, value = excluded.value"
+                " WHERE cache.expires_at <= ?",
+                (self.namespace, key, now + (ttl or self.ttl), orjson.dumps(value, default=str), now),
+            )
+            return cur.rowcount == 1
+
+    def incr(self, key: str, delta: int = 1, ttl: Optional[float] = None) -> int:
+        now = time.time()
+        with self._conn() as conn:
+            # Values are stored as JSON text, so the counter is kept as its decimal text form
+            conn.execute(
+                "INSERT INTO cache (ns, key, expires_at, value) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (ns, key) DO UPDATE SET"
+                " value = CASE WHEN cache.expires_at <= ? THEN excluded.value"
+                "   ELSE CAST(CAST(CAST(cache.value AS TEXT) AS INTEGER) + ? AS TEXT) END,"
+                " expires_at = CASE WHEN cache.expires_at <= ? THEN excluded.expires_at ELSE cache.expires_at END",
+                (self.namespace, key, now + (ttl or self.ttl), str(delta), now, delta, now),
+            )
+            row = conn.execute(
+                "SELECT value FROM cache WHERE ns = ? AND key = ?", (self.namespace, key)
+            ).fetchone()
+        return int(row[0])
+
+    def delete(self, key: str):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM cache WHERE ns = ? AND key = ?", (self.namespace, key))
+
+    def has(self, key: str) -> bool:
+        row = self._conn().execute(
+            "SELECT 1 FROM cache WHERE ns = ? AND key = ? AND expires_at > ?",
+            (self.namespace, key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    def _maybe_prune(self):
+        self._sets += 1
+        if self._sets % self.PRUNE_EVERY:
+            return
+        with self._conn() as conn:
+            conn.execute("DELETE FROM cache WHERE ns = ? AND expires_at <= ?", (self.namespace, time.time()))
+            conn.execute(
+                "DELETE FROM cache WHERE ns = ? AND key NOT IN"
+                " (SELECT key FROM cache WHERE ns = ? ORDER BY expires_at DESC LIMIT ?)",
+                (self.namespace, self.namespace, self.max_entries),
+            )
+
+
+_caches: Dict[str, CacheBackend] = {}
+
+
+def get_cache(namespace: str, ttl: float, max_entries: int = 1024) -> CacheBackend:
+    """
+    Return the process-wide cache for `namespace`, using the backend selected by CACHE_BACKEND.
+    """
+    cache = _caches.get(namespace)
+    if cache is None:
+        if CACHE_BACKEND == "memory":
+            cache = MemoryCache(namespace, ttl, max_entries)
+        elif CACHE_BACKEND == "sqlite":
+            cache = SQLiteCache(namespace, ttl, max_entries)
+        else:
+            raise ValueError(f"Unknown CACHE_BACKEND: {CACHE_BACKEND}")
+        _caches[namespace] = cache
+    return cache
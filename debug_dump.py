@@ -0,0 +1,32 @@
+## debug_dump.py writes the last analysis document to disk for debugging. It is opt-in and sampled,
+## and is meant to run as a background task so it never adds latency to the /analyze response.
+
+import os
+import random
+from pathlib import Path
+from dotenv import load_dotenv
+import orjson
+
+load_dotenv()
+
+# Unset (the default) disables dumping entirely, e.g. DEBUG_DUMP_PATH=last_result.json
+DEBUG_DUMP_PATH = os.getenv("DEBUG_DUMP_PATH", "").strip()
+# Fraction of analyses to dump when enabled (0.0 - 1.0)
+DEBUG_DUMP_SAMPLE_RATE = float(os.getenv("DEBUG_DUMP_SAMPLE_RATE", "1.0"))
+
+
+def should_dump() -> bool:
+    return bool(DEBUG_DUMP_PATH) and random.random() < DEBUG_DUMP_SAMPLE_RATE
+
+
+def write_debug_dump(doc: dict) -> None:
+    """
+    Atomically replace DEBUG_DUMP_PATH with `doc` (tmp file + rename, so readers never see half a file).
+    """
+    out_path = Path(DEBUG_DUMP_PATH)
+    tmp_path = out_path.with_name(out_path.name + ".tmp")
+    try:
+        tmp_path.write_bytes(orjson.dumps(doc, default=str, option=orjson.OPT_INDENT_2))
+        os.replace(tmp_path, out_path)
+    except Exception as e:
+        print("⚠️ Debug dump failed:", e)
@@ -0,0 +1,86 @@
+## events.py is an in-process event bus for pushing analysis updates to connected clients
+## (WebSocket /ws/analyses and SSE /analysis/events) instead of having pages re-poll Mongo.
+## With MONGO_CHANGE_STREAMS=1 the bus is fed from a Mongo change stream instead, so every worker
+## (and every replica) sees inserts and favorite toggles made anywhere.
+
+import asyncio
+import os
+import threading
+from typing import Callable, Optional, Set
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MONGO_CHANGE_STREAMS = os.getenv("MONGO_CHANGE_STREAMS", "0") == "1"
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class EventBus:
+    def __init__(self):
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def publish(self, event: dict):
+        """
+        Fan an event out to every subscriber. Must be called on the event loop; slow clients lose
+        their oldest events rather than blocking everyone else.
+        """
+        for queue in list(self._subscribers):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    def publish_threadsafe(self, event: dict):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self.publish, event)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+
+bus = EventBus()
+
+
+def emit(event: dict):
+    """
+    Publish a locally produced event from any thread. Skipped when the change stream is the source,
+    since it will deliver the same change (to every worker).
+    """
+    if not MONGO_CHANGE_STREAMS:
+        bus.publish_threadsafe(event)
+
+
+def watch_change_stream(collection, to_events: Callable[[dict], list]) -> Optional[threading.Thread]:
+    """
+    Tail `collection`'s change stream in a daemon thread and publish `to_events(change)` for each change.
+    Requires a replica set / Atlas; logs and gives up otherwise.
+    """
+    if not MONGO_CHANGE_STREAMS:
+        return None
+
+    def run():
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update"]}}}]
+        try:
+            with collection.watch(pipeline, full_document="updateLookup") as stream:
+                print("📡 Mongo change stream connected")
+                for change in stream:
+                    for event in to_events(change):
+                        bus.publish_threadsafe(event)
+        except Exception as e:
+            print("❌ Mongo change stream stopped:", e)
+
+    thread = threading.Thread(target=run, name="mongo-change-stream", daemon=True)
+    thread.start()
+    return thread
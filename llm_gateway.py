@@ -0,0 +1,225 @@
+## llm_gateway.py is the single process-wide entry point for Gemini calls. It reuses one model client,
+## caps concurrent calls with a priority queue (interactive requests jump ahead of batch/prewarm work),
+## applies per-call timeouts and cancellation, and keeps token + latency accounting per route.
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Optional, Union
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+from dotenv import load_dotenv
+from scripts import resilience
+from scripts.cancellation import Cancelled
+
+load_dotenv()
+genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+GEMINI_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", "4"))
+GEMINI_TIMEOUT_S = float(os.getenv("GEMINI_TIMEOUT_S", "60"))
+
+# Lower number = served first
+INTERACTIVE = 0
+BATCH = 10
+
+# Transient Gemini failures worth retrying (quota bursts, overload, timeouts)
+GEMINI_RETRYABLE = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.InternalServerError,
+)
+
+
+class Priority:
+    """
+    Mutable priority for a call shared by several requesters (e.g. a coalesced computation):
+    when a more urgent requester joins, it raises the priority and the gateway picks that up,
+    even for a call already queued.
+    """
+
+    def __init__(self, value: int):
+        self.value = value
+
+    def raise_to(self, value: int):
+        if value < self.value:
+            self.value = value
+
+
+class GatewayTimeout(Exception):
+    pass
+
+
+class GatewayCancelled(Cancelled):
+    pass
+
+
+class _PriorityLimiter:
+    """
+    Counting semaphore whose waiters are woken in (priority, arrival) order.
+    """
+
+    def __init__(self, limit: int):
+        self._limit = limit
+        self._active = 0
+        self._waiters = []  # heap of [priority, seq, event]
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def acquire(self, priority: Priority, deadline: float, cancel: Optional[threading.Event] = None):
+        with self._lock:
+            if self._active < self._limit and not self._waiters:
+                self._active += 1
+                return
+            entry = [priority.value, next(self._seq), threading.Event()]
+            heapq.heappush(self._waiters, entry)
+
+        while not entry[2].wait(0.25):
+            if priority.value < entry[0]:
+                with self._lock:
+                    if not entry[2].is_set():
+                        entry[0] = priority.value  # raised while queued, move up the line
+                        heapq.heapify(self._waiters)
+            cancelled = cancel is not None and cancel.is_set()
+            if not cancelled and time.monotonic() < deadline:
+                continue
+            with self._lock:
+                if entry[2].is_set():
+                    self._release_locked()  # slot was handed over as we gave up, pass it on
+                else:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+            raise GatewayCancelled("cancelled while queued") if cancelled else GatewayTimeout("timed out while queued")
+
+    def release(self):
+        with self._lock:
+            self._release_locked()
+
+    def _release_locked(self):
+        if self._waiters:
+            heapq.heappop(self._waiters)[2].set()  # hand the slot straight to the next waiter
+        else:
+            self._active -= 1
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+
+class GeminiGateway:
+    def __init__(self, model_name: str = GEMINI_MODEL, concurrency: int = GEMINI_CONCURRENCY):
+        self.model_name = model_name
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._limiter = _PriorityLimiter(concurrency)
+        self._stats: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self._stats_lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    def generate(self, prompt, route: str = "default", priority: Union[int, Priority] = INTERACTIVE,
+                 timeout: float = GEMINI_TIMEOUT_S, cancel: Optional[threading.Event] = None):
+        """
+        Run one generate_content call. `timeout` covers queueing plus the call itself.
+        Pass a Priority instead of an int to let it be raised while the call is queued.
+        """
+        if not isinstance(priority, Priority):
+            priority = Priority(priority)
+        started = time.monotonic()
+        deadline = min(started + timeout, getattr(cancel, "deadline", None) or float("inf"))
+        gemini = resilience.provider("gemini")
+        queued_s = 0.0
+
+        try:
+            # Retries happen out here, *without* a slot: a call backing off on 429s must not hold
+            # concurrency that other requests could use.
+            for attempt in range(gemini.max_attempts):
+                self._check(cancel, deadline)
+                wait_started = time.monotonic()
+                self._limiter.acquire(priority, deadline, cancel)
+                queued_s += time.monotonic() - wait_started
+                try:
+                    # Checked here rather than inside the provider call so they don't count as Gemini failures
+                    self._check(cancel, deadline)
+                    resp = gemini.call(
+                        lambda: self.model.generate_content(
+                            prompt, request_options={"timeout": deadline - time.monotonic()}
+                        ),
+                        retry_on=GEMINI_RETRYABLE,
+                        max_attempts=1,
+                    )
+                    break
+                except (resilience.RetryableError, *GEMINI_RETRYABLE) as e:
+                    delay = resilience.backoff_delay(attempt, gemini.base_delay, gemini.max_delay,
+                                                     getattr(e, "retry_after", None))
+                    if attempt == gemini.max_attempts - 1 or delay is None or time.monotonic() + delay >= deadline:
+                        raise
+                    reason = str(e)
+                finally:
+                    self._limiter.release()
+
+                print(f"[RETRY] gemini: {reason} — retrying in {delay:.1f}s")
+                self._sleep(delay, cancel)
+        except Exception:
+            self._record(route, queued_s, time.monotonic() - started, None, error=True)
+            raise
+
+        self._record(route, queued_s, time.monotonic() - started, getattr(resp, "usage_metadata", None))
+        return resp
+
+    @staticmethod
+    def _check(cancel, deadline: float):
+        if cancel is not None and cancel.is_set():
+            raise GatewayCancelled("cancelled")
+        if deadline <= time.monotonic():
+            raise GatewayTimeout("deadline exceeded")
+
+    @staticmethod
+    def _sleep(delay: float, cancel):
+        # Back off in short steps so a cancelled request stops waiting promptly
+        end = time.monotonic() + delay
+        while (remaining := end - time.monotonic()) > 0:
+            if cancel is not None and cancel.is_set():
+                raise GatewayCancelled("cancelled during backoff")
+            time.sleep(min(0.25, remaining))
+
+    def _record(self, route: str, queued_s: float, total_s: float, usage, error: bool = False):
+        with self._stats_lock:
+            s = self._stats[route]
+            s["calls"] += 1
+            s["errors"] += 1 if error else 0
+            s["queue_s"] += queued_s
+            s["latency_s"] += total_s
+            s["max_latency_s"] = max(s["max_latency_s"], total_s)
+            if usage is not None:
+                s["input_tokens"] += getattr(usage, "prompt_token_count", 0) or 0
+                s["output_tokens"] += getattr(usage, "candidates_token_count", 0) or 0
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            routes = {}
+            for route, s in self._stats.items():
+                calls = s["calls"] or 1
+                routes[route] = {
+                    "calls": int(s["calls"]),
+                    "errors": int(s["errors"]),
+                    "inputTokens": int(s["input_tokens"]),
+                    "outputTokens": int(s["output_tokens"]),
+                    "avgLatencyMs": round(1000 * s["latency_s"] / calls, 1),
+                    "maxLatencyMs": round(1000 * s["max_latency_s"], 1),
+                    "avgQueueMs": round(1000 * s["queue_s"] / calls, 1),
+                }
+        return {"model": self.model_name, "queued": self._limiter.queued, "routes": routes}
+
+
+gateway = GeminiGateway()
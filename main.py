@@ -1,10 +1,22 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 from typing import List
 from auth import signup_user, login_user
 from database import db
 
-app = FastAPI(title="NextCandle Backend")
+app = FastAPI(title="NextCandle Backend", default_response_class=ORJSONResponse)
+
+# ---------- COMPRESSION ----------
+# Analysis documents carry every scraped article, so compress anything over ~1KB.
+# Brotli is used when brotli-asgi is installed (falls back to gzip for clients that lack it).
+COMPRESS_MIN_BYTES = 1024
+try:
+    from brotli_asgi import BrotliMiddleware
+    app.add_middleware(BrotliMiddleware, minimum_size=COMPRESS_MIN_BYTES, gzip_fallback=True)
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESS_MIN_BYTES)
 
 # ---------- MODELS ----------
 class UserSignup(BaseModel):
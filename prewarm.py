@@ -0,0 +1,164 @@
+## prewarm.py periodically precomputes analyses for favorited and most-requested tickers during off-peak hours,
+## so interactive /analyze calls for those windows are served straight from the analysis cache.
+
+import asyncio
+import os
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Tuple
+from dotenv import load_dotenv
+from pymongo import DESCENDING
+from cache import MemoryCache
+
+load_dotenv()
+
+PREWARM_ENABLED = os.getenv("PREWARM_ENABLED", "0") == "1"
+PREWARM_HOURS = os.getenv("PREWARM_HOURS", "2-6")  # UTC hours [start, end) considered off-peak
+PREWARM_INTERVAL_S = int(os.getenv("PREWARM_INTERVAL_S", "1800"))
+PREWARM_CONCURRENCY = int(os.getenv("PREWARM_CONCURRENCY", "2"))
+PREWARM_MAX_PER_RUN = int(os.getenv("PREWARM_MAX_PER_RUN", "20"))
+PREWARM_MAX_PER_DAY = int(os.getenv("PREWARM_MAX_PER_DAY", "100"))
+PREWARM_TOP_TICKERS = int(os.getenv("PREWARM_TOP_TICKERS", "10"))
+PREWARM_HISTORY = 1000  # recent analyses inspected to find popular tickers / window lengths
+
+
+def in_off_peak(now: datetime, hours: str = PREWARM_HOURS) -> bool:
+    start, end = (int(h) for h in hours.split("-"))
+    if start <= end:
+        return start <= now.hour < end
+    return now.hour >= start or now.hour < end  # window wraps midnight, e.g. "22-4"
+
+
+def warm_ttl(now: datetime, hours: str = PREWARM_HOURS) -> float:
+    """
+    Seconds from `now` until the end of the *next* off-peak window. Prewarmed entries are written
+    around the start of off-peak and must outlive the following day's interactive traffic (with the
+    default 2-6 UTC window, a 12h TTL would expire right as US markets open) until the next cycle
+    has warmed that day's windows.
+    """
+    end = int(hours.split("-")[1]) % 24
+    until = now.replace(hour=end, minute=0, second=0, microsecond=0)
+    while until <= now:
+        until += timedelta(days=1)
+    if in_off_peak(now, hours):
+        until += timedelta(days=1)  # skip the window we're in
+    return (until - now).total_seconds()
+
+
+def _window_days(doc: dict) -> int:
+    try:
+        start = datetime.fromisoformat(doc["start_date"])
+        end = datetime.fromisoformat(doc["end_date"])
+        return (end - start).days
+    except Exception:
+        return 0
+
+
+def pick_targets(collection, today: datetime) -> List[Tuple[str, str, str]]:
+    """
+    (ticker, start, end) windows to precompute: favorited tickers first, then the most requested,
+    each over its most common window lengths ending today.
+    """
+    docs = collection.find(
+        {}, {"ticker": 1, "start_date": 1, "end_date": 1, "favorited": 1}
+    ).sort("created_at", DESCENDING).limit(PREWARM_HISTORY)
+
+    requests_per_ticker: Counter = Counter()
+    lengths: Dict[str, Counter] = defaultdict(Counter)
+    favorited = set()
+    for doc in docs:
+        ticker = (doc.get("ticker") or "").upper()
+        if not ticker:
+            continue
+        requests_per_ticker[ticker] += 1
+        days = _window_days(doc)
+        if days > 0:
+            lengths[ticker][days] += 1
+        if doc.get("favorited"):
+            favorited.add(ticker)
+
+    ranked = sorted(favorited, key=lambda t: -requests_per_ticker[t])
+    ranked += [t for t, _ in requests_per_ticker.most_common(PREWARM_TOP_TICKERS) if t not in favorited]
+
+    end = today.date()
+    targets = []
+    for ticker in ranked:
+        for days, _ in lengths[ticker].most_common(2):
+            start = end - timedelta(days=days)
+            targets.append((ticker, start.isoformat(), end.isoformat()))
+    return targets
+
+
+class PrewarmScheduler:
+    def __init__(self, collection, compute: Callable[[str, str, str], Awaitable[bool]], lease=None):
+        """
+        `compute(ticker, start, end)` runs (or joins) the analysis and returns False if it was already cached.
+        `lease` is an optional shared cache; with several workers only the one that claims it runs each cycle,
+        and the daily budget is counted there so it holds across workers and restarts.
+        """
+        self.collection = collection
+        self.compute = compute
+        self.lease = lease
+        self._spent = lease if lease is not None else MemoryCache("prewarm", ttl=2 * 86400)
+        self._task = None
+
+    def start(self):
+        if PREWARM_ENABLED and self._task is None:
+            print(f"🔥 Prewarm scheduler started (off-peak {PREWARM_HOURS} UTC, every {PREWARM_INTERVAL_S}s)")
+            self._task = asyncio.create_task(self._loop())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            now = datetime.now(timezone.utc)
+            if in_off_peak(now):
+                try:
+                    await self.run_once(now)
+                except Exception as e:
+                    print("❌ Prewarm run failed:", e)
+            await asyncio.sleep(PREWARM_INTERVAL_S)
+
+    async def run_once(self, now: datetime):
+        lease_ttl = max(60, PREWARM_INTERVAL_S - 60)
+        if self.lease is not None and not await asyncio.to_thread(self.lease.add, "run", os.getpid(), lease_ttl):
+            return  # another worker has this cycle
+
+        targets = await asyncio.to_thread(pick_targets, self.collection, now)
+        if not targets:
+            return
+
+        spent_key = f"spent:{now.date().isoformat()}"
+
+        sem = asyncio.Semaphore(PREWARM_CONCURRENCY)
+        reserved = 0
+        computed = 0
+
+        async def spend(delta: int) -> int:
+            return await asyncio.to_thread(self._spent.incr, spent_key, delta, 2 * 86400)
+
+        async def warm(ticker: str, start: str, end: str):
+            nonlocal reserved, computed
+            async with sem:
+                if reserved >= PREWARM_MAX_PER_RUN:
+                    return
+                reserved += 1  # reserve before awaiting so concurrent workers can't overshoot the budget
+                if await spend(1) > PREWARM_MAX_PER_DAY:
+                    await spend(-1)
+                    return
+                try:
+                    if await self.compute(ticker, start, end):
+                        computed += 1
+                        return
+                except Exception as e:
+                    print(f"⚠️ Prewarm {ticker} {start}->{end} failed:", e)
+                    computed += 1  # failed runs still cost scraper/LLM calls
+                    return
+                reserved -= 1  # already cached, nothing spent
+                await spend(-1)
+
+        await asyncio.gather(*(warm(*t) for t in targets))
+        print(f"🔥 Prewarm run done: {computed} computed, {len(targets)} candidates")
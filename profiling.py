@@ -0,0 +1,88 @@
+## profiling.py holds opt-in memory and CPU profiling hooks used by the /admin/profile endpoints:
+## tracemalloc snapshots (top allocation sites), process peak RSS, and a lightweight sampling profiler
+## that periodically records every thread's stack. Nothing here runs unless an admin turns it on.
+
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import List
+
+
+def rss_peak_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def start_tracemalloc(frames: int = 10):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def stop_tracemalloc():
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def memory_report(limit: int = 20) -> dict:
+    """
+    Current / peak traced memory plus the top allocation sites (by line) if tracemalloc is on.
+    """
+    report = {"tracing": tracemalloc.is_tracing(), "rssPeakMb": rss_peak_mb()}
+    if not tracemalloc.is_tracing():
+        return report
+
+    current, peak = tracemalloc.get_traced_memory()
+    stats = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    )).statistics("lineno")
+
+    report.update({
+        "currentMb": round(current / 2**20, 2),
+        "peakMb": round(peak / 2**20, 2),
+        "top": [
+            {"site": str(s.traceback[0]), "sizeKb": round(s.size / 1024, 1), "count": s.count}
+            for s in stats[:limit]
+        ],
+    })
+    return report
+
+
+def sample_stacks(seconds: float = 5.0, interval: float = 0.01, limit: int = 25) -> dict:
+    """
+    Sample every thread's stack for `seconds` (blocking; run in a worker thread) and return the
+    most frequently seen frames. Self-time = innermost frame, cumulative = anywhere on the stack.
+    """
+    me = threading.get_ident()
+    self_counts: Counter = Counter()
+    cumulative: Counter = Counter()
+    samples = 0
+    deadline = time.monotonic() + seconds
+
+    while time.monotonic() < deadline:
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            leaf = True
+            seen = set()
+            while frame is not None:
+                code = frame.f_code
+                site = f"{code.co_filename}:{frame.f_lineno} {code.co_name}"
+                if leaf:
+                    self_counts[site] += 1
+                    leaf = False
+                if site not in seen:
+                    cumulative[site] += 1
+                    seen.add(site)
+                frame = frame.f_back
+        samples += 1
+        time.sleep(interval)
+
+    def top(counter: Counter) -> List[dict]:
+        return [{"site": site, "samples": n} for site, n in counter.most_common(limit)]
+
+    return {"samples": samples, "intervalMs": interval * 1000, "self": top(self_counts), "cumulative": top(cumulative)}
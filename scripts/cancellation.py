@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+"""
+NextCandle - Cooperative cancellation for long-running work (scraper, article fetches, Gemini calls)
+
+A CancelToken is created per request and checked between units of work. It trips either when
+cancel() is called (client disconnected, every waiter went away) or when its deadline passes.
+It quacks like threading.Event (is_set), so it can be handed to anything that polls an Event.
+"""
+import threading
+import time
+from typing import Optional
+
+
+class Cancelled(Exception):
+    pass
+
+
+class CancelToken:
+    def __init__(self, timeout: Optional[float] = None):
+        self._event = threading.Event()
+        self._reason = ""
+        self.deadline = time.monotonic() + timeout if timeout else None
+
+    def cancel(self, reason: str = "cancelled"):
+        if not self._event.is_set():
+            self._reason = reason
+            self._event.set()
+
+    def is_set(self) -> bool:
+        if self._event.is_set():
+            return True
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("deadline exceeded")
+            return True
+        return False
+
+    @property
+    def reason(self) -> str:
+        return self._reason
+
+    def raise_if_cancelled(self):
+        if self.is_set():
+            raise Cancelled(self._reason)
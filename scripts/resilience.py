@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+"""
+NextCandle - Resilience layer for external providers (Finnhub, Yahoo, Gemini, article hosts)
+
+Each provider gets:
+- a token bucket rate limit
+- a circuit breaker that fails fast while the dependency is sick
+- jittered exponential backoff that honors Retry-After
+- optional hedged requests (async only) to cut tail latency on idempotent calls
+
+`Provider.acall` never blocks the event loop. `Provider.call` is the same policy for code that
+already runs in a worker thread (the scraper, the Gemini analyzer) and sleeps that thread only.
+"""
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, Optional, Tuple, Type, TypeVar
+from urllib.parse import urlparse
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+
+class RetryableError(Exception):
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+# ---------- helpers ----------
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Retry-After is either delta-seconds or an HTTP date.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+
+def check_response(resp):
+    """
+    Raise RetryableError for throttling / transient server errors so the caller's policy retries them.
+    """
+    if resp.status_code in RETRYABLE_STATUS:
+        raise RetryableError(
+            f"HTTP {resp.status_code} from {urlparse(resp.url).netloc}",
+            retry_after=parse_retry_after(resp.headers.get("Retry-After")),
+        )
+    return resp
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 10.0,
+                  retry_after: Optional[float] = None) -> Optional[float]:
+    """
+    Full-jitter delay before the next attempt. A server-provided Retry-After is a hard floor;
+    returns None (give up) when it asks us to wait longer than `cap`.
+    """
+    if retry_after is not None and retry_after > cap:
+        return None
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+# ---------- primitives ----------
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Take a token and return how long the caller must wait before using it.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def try_acquire(self) -> bool:
+        """
+        Take a token only if one is available right now.
+        """
+        if self.reserve() == 0.0:
+            return True
+        with self._lock:
+            self._tokens += 1  # give back the reservation
+        return False
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._probing:
+                self._probing = True  # let exactly one trial call through
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release_probe(self):
+        """
+        The call ended without a verdict (e.g. it was cancelled); let the next call probe instead.
+        """
+        with self._lock:
+            self._probing = False
+
+
+# ---------- provider policy ----------
+
+class Provider:
+    def __init__(self, name: str, rate: float = 5.0, burst: float = 5.0, max_attempts: int = 3,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 base_delay: float = 0.5, max_delay: float = 10.0):
+        self.name = name
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+    def _admit(self):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+    def call(self, fn: Callable[[], T], retry_on: Tuple[Type[BaseException], ...] = (),
+             max_attempts: Optional[int] = None) -> T:
+        """
+        Run `fn` under this provider's policy, sleeping the *current thread* between attempts.
+        Only call this from worker threads, never directly from an async handler.
+        `max_attempts=1` lets callers that hold a scarce resource run their own retry loop.
+        """
+        attempts = max_attempts or self.max_attempts
+        for attempt in range(attempts):
+            self._admit()
+            time.sleep(self.bucket.reserve())
+            try:
+                result = fn()
+            except (RetryableError, *retry_on) as e:
+                # Only dependency trouble counts toward the breaker
+                self.breaker.record_failure()
+                delay = backoff_delay(attempt, self.base_delay, self.max_delay, getattr(e, "retry_after", None))
+                if attempt == attempts - 1 or delay is None:
+                    raise
+                print(f"[RETRY] {self.name}: {e} — retrying in {delay:.1f}s")
+                time.sleep(delay)
+            except BaseException:
+                # Caller errors (bad request, invalid prompt) and cancellation say nothing about
+                # the dependency's health: neither count as failures, but a probe must be released
+                self.breaker.release_probe()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+
+    async def acall(self, fn: Callable[[], Awaitable[T]], retry_on: Tuple[Type[BaseException], ...] = (),
+                    hedge_after: Optional[float] = None) -> T:
+        """
+        Async version of `call`. With `hedge_after`, a second identical request is started if the first
+        has not finished after that many seconds, and whichever succeeds first wins (idempotent calls only).
+        """
+        for attempt in range(self.max_attempts):
+            self._admit()
+            await asyncio.sleep(self.bucket.reserve())
+            try:
+                if hedge_after is None:
+                    result = await fn()
+                else:
+                    result = await self._hedged(fn, hedge_after)
+            except (RetryableError, *retry_on) as e:
+                # Only dependency trouble counts toward the breaker
+                self.breaker.record_failure()
+                delay = backoff_delay(attempt, self.base_delay, self.max_delay, getattr(e, "retry_after", None))
+                if attempt == self.max_attempts - 1 or delay is None:
+                    raise
+                print(f"[RETRY] {self.name}: {e} — retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+            except BaseException:  # caller errors and asyncio.CancelledError, see call()
+                self.breaker.release_probe()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+
+    async def _hedged(self, fn: Callable[[], Awaitable[T]], hedge_after: float) -> T:
+        first = asyncio.ensure_future(fn())
+        done, _ = await asyncio.wait({first}, timeout=hedge_after)
+        if done:
+            return first.result()
+
+        if not self.bucket.try_acquire():
+            return await first  # no spare budget for a hedge, keep waiting on the original
+
+        pending = {first, asyncio.ensure_future(fn())}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+# ---------- registry ----------
+
+# Defaults sized for free tiers: Finnhub allows 60 calls/min, Yahoo search throttles aggressively
+PROVIDER_DEFAULTS: Dict[str, dict] = {
+    "finnhub": {"rate": 1.0, "burst": 5, "max_attempts": 3},
+    "yahoo": {"rate": 2.0, "burst": 4, "max_attempts": 3},
+    "gemini": {"rate": 2.0, "burst": 4, "max_attempts": 3, "base_delay": 1.0, "max_delay": 20.0},
+    # The redirect hop in front of every Finnhub article link: fail fast and stop paying for it when it's slow
+    "finnhub-redirect": {"rate": 5.0, "burst": 10, "max_attempts": 1, "failure_threshold": 5, "reset_timeout": 60.0},
+}
+# Article hosts are many and cheap to give up on: don't retry, and trip after a few timeouts /
+# connection errors on that publisher. The limit is per publisher, so different hosts never queue on each other.
+ARTICLE_HOST_DEFAULTS = {"rate": 5.0, "burst": 10, "max_attempts": 1, "failure_threshold": 3, "reset_timeout": 120.0}
+# Hosts that only redirect to the real publisher (Finnhub news links). The hop is resolved first under the
+# "finnhub-redirect" provider, so the publisher's own host limit and breaker apply to the article fetch.
+REDIRECTOR_HOSTS = {"finnhub.io"}
+
+_providers: Dict[str, Provider] = {}
+_providers_lock = threading.Lock()
+
+
+def provider(name: str) -> Provider:
+    with _providers_lock:
+        p = _providers.get(name)
+        if p is None:
+            p = _providers[name] = Provider(name, **PROVIDER_DEFAULTS.get(name, {}))
+        return p
+
+
+def is_redirector(url: str) -> bool:
+    host = urlparse(url).netloc.lower()
+    return any(host == h or host.endswith("." + h) for h in REDIRECTOR_HOSTS)
+
+
+def host_provider(url: str) -> Provider:
+    host = urlparse(url).netloc.lower()
+    with _providers_lock:
+        key = f"host:{host}"
+        p = _providers.get(key)
+        if p is None:
+            p = _providers[key] = Provider(key, **ARTICLE_HOST_DEFAULTS)
+        return p
@@ -7,7 +7,8 @@ NextCandle - Prior Window Scraper (Finnhub-only)
 - Fetch all company news from Finnhub for the 31 days BEFORE --start
 - Compute % change and UP/DOWN label over [start, end)
 - Save:
-    data/<ticker>_<start>_<end>_summary.json
+    append to the window store at data/windows/ (see window_store.py)
+    data/<ticker>_<start>_<end>.json as well with --json
 """
 from pathlib import Path
 from dotenv import load_dotenv
@@ -15,17 +16,29 @@ from dotenv import load_dotenv
 # load the .env that sits in the same folder as this script, and override any existing vars
 load_dotenv(dotenv_path=Path(__file__).resolve().parent / ".env", override=True)
 import math
-import argparse, json, os, re, time
+import argparse, json, os, re
 from datetime import datetime, timedelta, timezone
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import urljoin
 import requests, yfinance as yf
 from bs4 import BeautifulSoup
 
+try:
+    from scripts.window_store import WindowStore
+    from scripts import resilience
+    from scripts.cancellation import CancelToken
+except ImportError:  # run directly from scripts/
+    from window_store import WindowStore
+    import resilience
+    from cancellation import CancelToken
+
 # ---------- config ----------
 LOOKBACK_DAYS_DEFAULT = 1
 DATA_DIR = Path(__file__).resolve().parent / "data"
 DATA_DIR.mkdir(exist_ok=True)
 UA = {"User-Agent": "Mozilla/5.0 (NextCandle/1.0)"}
+# Optional ticker -> company name cache (anything with get/set); the API server plugs in a shared one
+company_name_cache = None
 # os.makedirs(DATA_DIR, exist_ok=True)
 
 # ---------- utilities ----------
@@ -38,6 +51,11 @@ def clean_company_name(name: str) -> str:
     return re.sub(r'\b(Inc\.?|Incorporated|Corp\.?|Corporation|Ltd\.?|Limited|PLC)\b', '', name, flags=re.I).strip()
 
 def resolve_company_name_from_ticker(ticker: str) -> str:
+    if company_name_cache is not None:
+        cached = company_name_cache.get(ticker)
+        if cached:
+            return cached
+
     t = yf.Ticker(ticker)
     name = None
     try:
@@ -45,7 +63,13 @@ def resolve_company_name_from_ticker(ticker: str) -> str:
         name = info.get("longName") or info.get("shortName")
     except Exception:
         pass
-    return clean_company_name(name) if name else ticker
+    if not name:
+        return ticker
+
+    name = clean_company_name(name)
+    if company_name_cache is not None:
+        company_name_cache.set(ticker, name)
+    return name
 
 def validate_ticker_has_data(ticker: str) -> bool:
     try:
@@ -54,10 +78,37 @@ def validate_ticker_has_data(ticker: str) -> bool:
     except Exception:
         return False
 
+def resolve_redirector(url: str, timeout: int = 3) -> str:
+    """
+    Finnhub article links point at finnhub.io and redirect to the publisher. Resolve that hop up front
+    so rate limits and circuit breakers apply to the real publisher, not to one shared redirector.
+    The hop has its own rate limit and breaker; while that is open the original link is returned as is.
+    """
+    if not resilience.is_redirector(url):
+        return url
+    try:
+        r = resilience.provider("finnhub-redirect").call(
+            lambda: requests.get(url, headers=UA, timeout=(min(2.05, timeout), timeout), allow_redirects=False),
+            retry_on=(requests.Timeout, requests.ConnectionError),
+        )
+    except resilience.CircuitOpenError:
+        return url
+    if r.is_redirect and r.headers.get("Location"):
+        return urljoin(url, r.headers["Location"])
+    return url
+
 def fetch_article_text(url: str, timeout: int = 12) -> str:
+    # Short connect timeout, and publishers that keep timing out are skipped by their circuit breaker
     try:
-        r = requests.get(url, headers=UA, timeout=timeout)
+        url = resolve_redirector(url)
+        r = resilience.host_provider(url).call(
+            lambda: requests.get(url, headers=UA, timeout=(min(3.05, timeout), timeout)),
+            retry_on=(requests.Timeout, requests.ConnectionError),
+        )
         r.raise_for_status()
+    except resilience.CircuitOpenError as e:
+        print(f"[SKIP] {e}")
+        return ""
     except Exception:
         return ""
     try:
@@ -118,10 +169,10 @@ def finnhub_company_news(ticker: str, start_dt: datetime, end_dt: datetime) -> L
     print(f"[DEBUG] Finnhub fetch: {symbol} {from_date} → {to_date}")
 
     try:
-        r = requests.get(url, params=params, headers=UA, timeout=15)
-        if r.status_code in (429, 502, 503, 504):
-            time.sleep(1.5)
-            r = requests.get(url, params=params, headers=UA, timeout=15)
+        r = resilience.provider("finnhub").call(
+            lambda: resilience.check_response(requests.get(url, params=params, headers=UA, timeout=15)),
+            retry_on=(requests.ConnectionError, requests.Timeout),
+        )
         r.raise_for_status()
 
         data = r.json()
@@ -244,6 +295,7 @@ def main():
     ap.add_argument("--end",    required=True, help="MM-DD-YYYY (window end)")
     ap.add_argument("--lookback", type=int, default=LOOKBACK_DAYS_DEFAULT)
     ap.add_argument("--fetch-text", action="store_true", help="Fetch and store article text (slower).")
+    ap.add_argument("--json", action="store_true", help="Also write a standalone pretty-printed JSON file.")
     args = ap.parse_args()
     # Enforce Finnhub's 30-day limit
     if args.lookback > 30:
@@ -321,10 +373,13 @@ def main():
         "articles": article_objs
     }
 
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(result, f, indent=2, ensure_ascii=False)
+    entry = WindowStore().append(result)
+    print(f"[DONE] appended {tag} to {entry['shard']}@{entry['offset']}")
 
-    print(f"[DONE] wrote {out_path}")
+    if args.json:
+        with open(out_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"[DONE] wrote {out_path}")
 
 def parse_date(d: str) -> datetime:
     # Try both ISO (YYYY-MM-DD) and US (MM-DD-YYYY) formats
@@ -335,56 +390,105 @@ def parse_date(d: str) -> datetime:
             continue
     raise ValueError(f"Unrecognized date format: {d}")
 
-def run_scraper(ticker: str, start: str, end: str, fetch_text: bool = True) -> dict:
-    """
-    Runs the scraper and returns the analysis result as a Python dict
-    instead of writing to a file.
-    """
-    print(f"[API CALL] Running scraper for {ticker} {start}->{end}")
-    start_dt = parse_date(start)
-    end_dt = parse_date(end)
+# ---------- streaming article pipeline (select → fetch/extract → budget) ----------
 
-    company = resolve_company_name_from_ticker(ticker)
-    s_close, e_close, pct, label = window_change(ticker, start_dt.date().isoformat(), end_dt.date().isoformat())
-    if pct is None:
-        raise ValueError("No price data returned for that window (check ticker or dates).")
+# Per-request memory budget for article bodies held by run_scraper (and everything downstream of it)
+ARTICLE_TEXT_BUDGET_BYTES = int(os.getenv("ARTICLE_TEXT_BUDGET_BYTES", str(512 * 1024)))
+MAX_ARTICLES_PER_REQUEST = int(os.getenv("MAX_ARTICLES_PER_REQUEST", "60"))
 
-    entries = finnhub_company_news(ticker, start_dt, end_dt)
 
-    articles = []
+def iter_window_entries(entries, start_dt: datetime, end_dt: datetime) -> Iterator[Dict]:
+    """
+    Select Finnhub entries published within (a day either side of) [start_dt, end_dt].
+    """
+    # Convert everything to naive UTC for consistent comparison
+    # ✅ Include articles published within a few days around the window
+    # (to prevent small timezone or API timing mismatches)
+    buffer = timedelta(days=1)
+    s_dt = start_dt.replace(tzinfo=None) - buffer
+    e_dt = end_dt.replace(tzinfo=None) + buffer
+
     for e in entries:
         pub_iso = e.get("published_at")
         if not pub_iso:
             continue
-
         try:
             # Normalize to UTC regardless of timezone format
-            pub_dt = datetime.fromisoformat(pub_iso.replace("Z", "+00:00"))
+            pub_dt = datetime.fromisoformat(pub_iso.replace("Z", "+00:00")).replace(tzinfo=None)
         except Exception:
             continue
+        if s_dt <= pub_dt <= e_dt:
+            yield e
 
-        # Convert everything to naive UTC for consistent comparison
-        pub_dt = pub_dt.replace(tzinfo=None)
-        s_dt = start_dt.replace(tzinfo=None)
-        e_dt = end_dt.replace(tzinfo=None)
-
-        # ✅ Include articles published within a few days around the window
-        # (to prevent small timezone or API timing mismatches)
-        buffer = timedelta(days=1)
-        if not (s_dt - buffer <= pub_dt <= e_dt + buffer):
-            continue
 
+def iter_articles(entries, fetch_text: bool = True, cancel: Optional[CancelToken] = None) -> Iterator[Dict]:
+    """
+    Fetch and extract one article at a time, so only the article in hand is held in memory.
+    """
+    for e in entries:
+        if cancel is not None:
+            cancel.raise_if_cancelled()
         url = e.get("url")
-        full_text = fetch_article_text(url) if fetch_text else e.get("text", "")
-
-        articles.append({
+        yield {
             "title": e.get("title"),
             "url": url,
-            "published_at": pub_iso,
+            "published_at": e.get("published_at"),
             "source": e.get("source"),
-            "text": full_text
-        })
+            "text": fetch_article_text(url) if fetch_text else e.get("text", ""),
+        }
+
+
+def take_within_budget(articles, max_bytes: int, max_articles: int,
+                       max_chars_per_article: Optional[int] = None) -> Iterator[Dict]:
+    """
+    Pass articles through until the text budget or article cap is reached. Stopping here also stops
+    the upstream generators, so no further articles are fetched. With `max_chars_per_article`, each
+    body is trimmed first, so the budget counts only the text the caller will actually use.
+    """
+    if max_articles <= 0:
+        return
+    used = 0
+    for n, a in enumerate(articles, 1):
+        if max_chars_per_article is not None:
+            a["text"] = a["text"][:max_chars_per_article]
+        size = len(a["text"].encode("utf-8"))
+        if used + size > max_bytes:
+            a["text"] = a["text"][:max(0, max_bytes - used) // 4]  # ≤4 bytes per char keeps us under
+            yield a
+            break
+        used += size
+        yield a
+        if n >= max_articles:
+            break  # before pulling (and fetching) one more
+
+
+def run_scraper(ticker: str, start: str, end: str, fetch_text: bool = True,
+                cancel: Optional[CancelToken] = None,
+                max_text_bytes: int = ARTICLE_TEXT_BUDGET_BYTES,
+                max_articles: int = MAX_ARTICLES_PER_REQUEST,
+                max_chars_per_article: Optional[int] = None) -> dict:
+    """
+    Runs the scraper and returns the analysis result as a Python dict
+    instead of writing to a file. Raises Cancelled between steps once `cancel` trips.
+    Article text is capped at `max_text_bytes` in total for the request (and optionally per article).
+    """
+    cancel = cancel or CancelToken()
+    print(f"[API CALL] Running scraper for {ticker} {start}->{end}")
+    start_dt = parse_date(start)
+    end_dt = parse_date(end)
+
+    company = resolve_company_name_from_ticker(ticker)
+    cancel.raise_if_cancelled()
+    s_close, e_close, pct, label = window_change(ticker, start_dt.date().isoformat(), end_dt.date().isoformat())
+    if pct is None:
+        raise ValueError("No price data returned for that window (check ticker or dates).")
+
+    cancel.raise_if_cancelled()
+    entries = finnhub_company_news(ticker, start_dt, end_dt)
 
+    selected = iter_window_entries(entries, start_dt, end_dt)
+    fetched = iter_articles(selected, fetch_text=fetch_text, cancel=cancel)
+    articles = list(take_within_budget(fetched, max_text_bytes, max_articles, max_chars_per_article))
 
     result = {
         "ticker": ticker,
@@ -396,7 +500,7 @@ def run_scraper(ticker: str, start: str, end: str, fetch_text: bool = True) -> d
         "articles": articles,
     }
 
-    print(f"[✅ DONE] Scraper finished for {ticker}")
+    print(f"[✅ DONE] Scraper finished for {ticker} ({len(articles)} articles)")
     return result
 
 
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+"""
+NextCandle - Window Store (append-only dataset of scraped windows)
+
+Layout under data/windows/:
+    shard-00000.jsonl, shard-00001.jsonl, ...   one compact JSON record per line, append-only
+    index.jsonl                                 one line per record: ticker, dates, shard, offset, length
+
+The index is small enough to load in full, so lookups by ticker / date range never open the shards.
+Record bodies are read through mmap (random access) or streamed shard by shard (full scans).
+A window is identified by (ticker, start_date, end_date): appending it again (a re-scrape or re-import)
+supersedes the earlier copy, which stays on disk but is no longer returned.
+
+Usage:
+    python window_store.py import data/*.json     # migrate standalone window files
+    python window_store.py ls [--ticker TSLA]
+"""
+from pathlib import Path
+import argparse, json, mmap, os
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-writer only
+    fcntl = None
+
+# ---------- config ----------
+STORE_DIR = Path(__file__).resolve().parent / "data" / "windows"
+SHARD_MAX_BYTES = 64 * 1024 * 1024
+INDEX_NAME = "index.jsonl"
+
+
+def _shard_name(n: int) -> str:
+    return f"shard-{n:05d}.jsonl"
+
+
+class WindowStore:
+    def __init__(self, root: Path = STORE_DIR, shard_max_bytes: int = SHARD_MAX_BYTES):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.shard_max_bytes = shard_max_bytes
+        self.index_path = self.root / INDEX_NAME
+        self._index: Optional[List[Dict]] = None
+        self._index_size = 0
+        self._maps: Dict[str, mmap.mmap] = {}
+
+    # ---------- writing ----------
+
+    def append(self, record: Dict) -> Dict:
+        """
+        Append one window record and return its index entry.
+        """
+        line = (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+        with open(self.index_path, "a+b") as idx:
+            if fcntl:
+                fcntl.flock(idx, fcntl.LOCK_EX)
+            try:
+                shard = self._current_shard(len(line))
+                with open(self.root / shard, "ab") as f:
+                    offset = f.seek(0, os.SEEK_END)
+                    f.write(line)
+
+                entry = {
+                    "ticker": (record.get("ticker") or "").upper(),
+                    "start_date": record.get("start_date"),
+                    "end_date": record.get("end_date"),
+                    "shard": shard,
+                    "offset": offset,
+                    "length": len(line),
+                }
+                idx.write((json.dumps(entry, separators=(",", ":")) + "\n").encode("utf-8"))
+            finally:
+                if fcntl:
+                    fcntl.flock(idx, fcntl.LOCK_UN)
+
+        return entry
+
+    def _current_shard(self, incoming: int) -> str:
+        shards = sorted(self.root.glob("shard-*.jsonl"))
+        if not shards:
+            return _shard_name(0)
+        last = shards[-1]
+        if last.stat().st_size + incoming <= self.shard_max_bytes:
+            return last.name
+        return _shard_name(int(last.stem.split("-")[1]) + 1)
+
+    # ---------- index ----------
+
+    def index(self) -> List[Dict]:
+        """
+        Load the index, reading only lines appended since the last call.
+        """
+        if self._index is None:
+            self._index, self._index_size = [], 0
+        if not self.index_path.exists():
+            return self._index
+
+        with open(self.index_path, "rb") as f:
+            f.seek(self._index_size)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break  # partially written line, pick it up next time
+                self._index.append(json.loads(raw))
+                self._index_size += len(raw)
+        return self._index
+
+    def latest(self) -> List[Dict]:
+        """
+        Index entries with superseded copies dropped: the last append of each window wins.
+        """
+        latest: Dict[tuple, Dict] = {}
+        for e in self.index():
+            key = (e["ticker"], e.get("start_date"), e.get("end_date"))
+            latest.pop(key, None)  # re-insert so order follows the newest copy
+            latest[key] = e
+        return list(latest.values())
+
+    def query(self, ticker: Optional[str] = None, start: Optional[str] = None,
+              end: Optional[str] = None) -> List[Dict]:
+        """
+        Index entries for `ticker` whose window overlaps [start, end] (ISO YYYY-MM-DD, either bound optional).
+        """
+        ticker = ticker.upper() if ticker else None
+        out = []
+        for e in self.latest():
+            if ticker and e["ticker"] != ticker:
+                continue
+            if start and (e.get("end_date") or "") < start:
+                continue
+            if end and (e.get("start_date") or "") > end:
+                continue
+            out.append(e)
+        return out
+
+    # ---------- reading ----------
+
+    def read(self, entry: Dict) -> Dict:
+        """
+        Random access to one record through a memory-mapped shard.
+        """
+        mm = self._map(entry["shard"], entry["offset"] + entry["length"])
+        return json.loads(mm[entry["offset"]:entry["offset"] + entry["length"]])
+
+    def _map(self, shard: str, needed: int) -> mmap.mmap:
+        mm = self._maps.get(shard)
+        if mm is None or len(mm) < needed:  # shard grew since it was mapped
+            if mm is not None:
+                mm.close()
+            with open(self.root / shard, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[shard] = mm
+        return mm
+
+    def iter_records(self, ticker: Optional[str] = None, start: Optional[str] = None,
+                     end: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Stream records matching the filters; with no filters this is a sequential scan of every shard
+        (skipping superseded copies).
+        """
+        if not (ticker or start or end):
+            live = {(e["shard"], e["offset"]) for e in self.latest()}
+            for shard in sorted(self.root.glob("shard-*.jsonl")):
+                with open(shard, "rb") as f:
+                    offset = 0
+                    for raw in f:
+                        if raw.endswith(b"\n") and (shard.name, offset) in live:
+                            yield json.loads(raw)
+                        offset += len(raw)
+            return
+
+        for e in self.query(ticker, start, end):
+            yield self.read(e)
+
+    def close(self):
+        for mm in self._maps.values():
+            mm.close()
+        self._maps.clear()
+
+
+# ---------- cli ----------
+
+def main():
+    ap = argparse.ArgumentParser(description="Inspect or populate the append-only window store.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    imp = sub.add_parser("import", help="Append standalone <ticker>_<start>_<end>.json files to the store.")
+    imp.add_argument("paths", nargs="+")
+    ls = sub.add_parser("ls", help="List indexed windows.")
+    ls.add_argument("--ticker")
+    ls.add_argument("--start", help="YYYY-MM-DD")
+    ls.add_argument("--end", help="YYYY-MM-DD")
+    args = ap.parse_args()
+
+    store = WindowStore()
+    if args.cmd == "import":
+        for p in args.paths:
+            with open(p, encoding="utf-8") as f:
+                entry = store.append(json.load(f))
+            print(f"[IMPORT] {p} -> {entry['shard']}@{entry['offset']}")
+    else:
+        for e in store.query(args.ticker, args.start, args.end):
+            print(f"{e['ticker']:<8} {e['start_date']} → {e['end_date']}  {e['shard']}@{e['offset']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+## singleflight.py coalesces identical in-flight work: the first caller for a key starts the computation,
+## every concurrent caller with the same key attaches to it, and all of them receive the same result.
+## When every caller has gone away (e.g. clients disconnected) the shared work is cancelled.
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+from scripts.cancellation import CancelToken
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task, token: CancelToken, priority=None):
+        self.task = task
+        self.token = token
+        self.priority = priority
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self, name: str = "flight", deadline_s: Optional[float] = None):
+        self.name = name
+        self.deadline_s = deadline_s
+        self._inflight: Dict[Hashable, _Flight] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    async def do(self, key: Hashable, fn: Callable[[CancelToken], Awaitable[Any]], priority=None) -> Any:
+        """
+        Await the result for `key`, starting `fn(token)` only if nothing is running for it yet.
+        The shared task is shielded so one caller going away does not cancel it for the others;
+        once the last caller leaves, `token` is cancelled and the task is cancelled too.
+        `priority` (an llm_gateway.Priority the work reads) is raised to each joining caller's.
+        """
+        flight = self._inflight.get(key)
+        if flight is None:
+            token = CancelToken(self.deadline_s)
+            coro = fn(token)
+            if self.deadline_s:
+                coro = asyncio.wait_for(coro, self.deadline_s)
+            flight = _Flight(asyncio.ensure_future(coro), token, priority)
+            self._inflight[key] = flight
+            flight.task.add_done_callback(lambda _t, k=key, f=flight: self._finish(k, f))
+        else:
+            print(f"🔗 [{self.name}] joined in-flight computation for {key}")
+            if priority is not None and flight.priority is not None:
+                flight.priority.raise_to(priority.value)
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                print(f"🛑 [{self.name}] no callers left, cancelling {key}")
+                flight.token.cancel("abandoned by all callers")
+                flight.task.cancel()
+                self._finish(key, flight)  # new callers for this key start fresh
+
+    def _finish(self, key: Hashable, flight: _Flight):
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+        if flight.task.done() and not flight.task.cancelled():
+            flight.task.exception()  # mark retrieved; callers already got it (or are gone)
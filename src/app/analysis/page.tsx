@@ -1,6 +1,6 @@
 'use client';
 
-import { useState } from 'react';
+import { useEffect, useRef, useState } from 'react';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '@/components/ui/card';
 import { Button } from '@/components/ui/button';
 import { DateRangeSelector } from '@/components/analysis/DateRangeSelector';
@@ -19,6 +19,10 @@ export default function AnalysisPage() {
   const [isSubmitting, setIsSubmitting] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [analysisResults, setAnalysisResults] = useState<any>(null);
+  const abortRef = useRef<AbortController | null>(null);
+
+  // Abort an in-flight analysis when leaving the page, so the backend can cancel the work
+  useEffect(() => () => abortRef.current?.abort(), []);
 
   const handleDateRangeChange = (startDate: string, endDate: string) => {
     setFormData(prev => ({ ...prev, startDate, endDate }));
@@ -37,6 +41,10 @@ export default function AnalysisPage() {
       return;
     }
 
+    abortRef.current?.abort();
+    const controller = new AbortController();
+    abortRef.current = controller;
+
     setIsSubmitting(true);
     
     try {
@@ -52,6 +60,7 @@ export default function AnalysisPage() {
           startDate: formData.startDate,
           endDate: formData.endDate,
         }),
+        signal: controller.signal,
       });
       
       const data = await response.json();
@@ -64,10 +73,16 @@ export default function AnalysisPage() {
       }
       
     } catch (error) {
+      if (error instanceof DOMException && error.name === 'AbortError') {
+        return; // unmounted or superseded by a newer submission
+      }
       console.error('Error submitting analysis:', error);
       setError('Failed to start analysis. Please try again.');
     } finally {
-      setIsSubmitting(false);
+      if (abortRef.current === controller) {
+        abortRef.current = null;
+        setIsSubmitting(false);
+      }
     }
   };
 
@@ -1,6 +1,6 @@
 'use client';
 
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '@/components/ui/card';
 import { Button } from '@/components/ui/button';
 import { 
@@ -15,6 +15,10 @@ import {
 } from 'lucide-react';
 import Link from 'next/link';
 import { formatDistanceToNow } from 'date-fns';
+import { API_BASE_URL, WS_BASE_URL } from '@/constants';
+
+// Matches the backend's /analysis/recent default and live snapshot size
+const RECENT_ANALYSES_LIMIT = 10;
 
 interface UserAnalysis {
   id: string;
@@ -60,6 +64,8 @@ export default function DashboardPage() {
   });
   const [isLoading, setIsLoading] = useState(true);
   const [activeTab, setActiveTab] = useState<'recent' | 'favorites'>('recent');
+  // Set once the live socket has delivered a snapshot; from then on it owns analyses + counters
+  const liveSynced = useRef(false);
 
   useEffect(() => {
     const loadDashboardData = async () => {
@@ -75,11 +81,14 @@ export default function DashboardPage() {
         // ✅ Fetch actual recent analyses
         const analysesRes = await fetch("http://localhost:8000/analysis/recent");
         const recentAnalyses = await analysesRes.json();
-        setAnalyses(recentAnalyses);
   
         // ✅ Fetch live stats from backend
         const res = await fetch("http://localhost:8000/analysis/stats");
         const statsData = await res.json();
+
+        // The socket snapshot (plus any deltas since) is newer than these responses
+        if (liveSynced.current) return;
+        setAnalyses(recentAnalyses);
   
         // ✅ Combine live stats with your existing structure
         setStats({
@@ -97,20 +106,88 @@ export default function DashboardPage() {
   
     loadDashboardData();
   }, []);
+
+  // ✅ Live updates pushed by the backend (new analyses, favorite toggles, stats deltas)
+  useEffect(() => {
+    let socket: WebSocket | null = null;
+    let retryTimer: ReturnType<typeof setTimeout> | undefined;
+    let closed = false;
+
+    const connect = () => {
+      socket = new WebSocket(`${WS_BASE_URL}/ws/analyses`);
+      // Deltas are only meaningful on top of this connection's snapshot; events missed while
+      // disconnected are covered by the fresh snapshot sent on every (re)connect
+      let hasBaseline = false;
+
+      socket.onmessage = (message) => {
+        const event = JSON.parse(message.data);
+        if (event.type === 'snapshot') {
+          hasBaseline = true;
+          liveSynced.current = true;
+          setAnalyses(event.analyses);
+          setStats(prev => ({
+            ...prev,
+            totalAnalyses: event.totalAnalyses,
+            favoriteStocks: event.favoriteStocks,
+          }));
+          return;
+        }
+        if (!hasBaseline) return;
+        switch (event.type) {
+          case 'analysis.created':
+            setAnalyses(prev => [event.analysis, ...prev.filter(a => a.id !== event.analysis.id)].slice(0, RECENT_ANALYSES_LIMIT));
+            break;
+          case 'analysis.favorited':
+            setAnalyses(prev => prev.map(a => (a.id === event.id ? { ...a, isFavorite: event.isFavorite } : a)));
+            break;
+          case 'stats.delta':
+            setStats(prev => ({
+              ...prev,
+              totalAnalyses: prev.totalAnalyses + event.totalAnalyses,
+              favoriteStocks: prev.favoriteStocks + event.favoriteStocks,
+            }));
+            break;
+        }
+      };
+
+      socket.onclose = () => {
+        if (!closed) retryTimer = setTimeout(connect, 3000);
+      };
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      socket?.close();
+    };
+  }, []);
   
 
   const handleToggleFavorite = async (analysisId: string, symbol: string) => {
     try {
-      // Toggle favorite status
+      // Persist the new value; the pushed stats delta updates the counters
+      const current = analyses.find(a => a.id === analysisId);
+      const favorited = !current?.isFavorite;
+      const res = await fetch(`${API_BASE_URL}/analysis/${analysisId}/favorite`, {
+        method: "PATCH",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ favorited }),
+      });
+      const result = await res.json();
+      if (!res.ok || result.error) {
+        throw new Error(result.error || `Request failed with status ${res.status}`);
+      }
+
+      // Set (not toggle) favorite status, so the pushed analysis.favorited event can't flip it back
       setAnalyses(prev => prev.map(analysis => 
         analysis.id === analysisId 
-          ? { ...analysis, isFavorite: !analysis.isFavorite }
+          ? { ...analysis, isFavorite: result.isFavorite }
           : analysis
       ));
 
       // Update favorites list
-      const analysis = analyses.find(a => a.id === analysisId);
-      if (analysis?.isFavorite) {
+      if (!result.isFavorite) {
         // Remove from favorites
         setFavorites(prev => prev.filter(fav => fav.symbol !== symbol));
       } else {
@@ -119,10 +196,10 @@ export default function DashboardPage() {
         const newFavorite: FavoriteStock = {
           id: Date.now().toString(),
           symbol,
-          companyName: analysis?.companyName || '',
+          companyName: current?.companyName || '',
           addedDate: new Date().toISOString(),
           analysisCount: 1,
-          lastAnalyzed: analysis?.analysisDate
+          lastAnalyzed: current?.analysisDate
         };
         setFavorites(prev => [...prev, newFavorite]);
         */
@@ -1,4 +1,7 @@
 import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Union
 from datetime import datetime, timezone
 from bson import ObjectId
 from database import db
@@ -8,19 +11,53 @@ from main import app
 from pymongo import MongoClient, DESCENDING
 import certifi
 import uvicorn
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, BackgroundTasks, WebSocket, WebSocketDisconnect
+from fastapi import Depends, Header, HTTPException
+import hmac
+from fastapi.responses import ORJSONResponse, StreamingResponse
+import orjson
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import FastAPI, Query
 import requests
-import time
 from scripts import scrape_prior_window
+from scripts import resilience
+from scripts.cancellation import CancelToken, Cancelled
 import json
 from pathlib import Path
-from analyzer import analyze_articles
+from analyzer import analyze_articles, PROMPT_ARTICLES_MAX_CHARS, PROMPT_ARTICLE_TEXT_CHARS
+from llm_gateway import gateway, INTERACTIVE, BATCH, Priority
+from singleflight import SingleFlight
+from cache import get_cache
+from prewarm import PrewarmScheduler, warm_ttl
+from debug_dump import should_dump, write_debug_dump
+from events import bus, emit, watch_change_stream
+import profiling
 
 
 collection = db.stocks  # matches your FastAPI route collection name
+# Per-request deadline; abandoned or overdue work is cancelled cooperatively (see scripts/cancellation.py)
+ANALYZE_DEADLINE_S = float(os.getenv("ANALYZE_DEADLINE_S", "180"))
+DISCONNECT_POLL_S = 1.0
+EVENT_KEEPALIVE_S = 25.0
+RECENT_ANALYSES_LIMIT = 10  # what /analysis/recent and the live snapshot return by default
+# Scraper + Gemini runs get their own threads: they can sit in the Gemini gateway queue for a long time,
+# and must not starve the default executor that Mongo, cache and search calls use via asyncio.to_thread
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "16"))
+pipeline_executor = ThreadPoolExecutor(max_workers=PIPELINE_WORKERS, thread_name_prefix="pipeline")
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+TRACEMALLOC_ON_STARTUP = os.getenv("TRACEMALLOC", "0") == "1"
+analysis_flights = SingleFlight("analyze", deadline_s=ANALYZE_DEADLINE_S)
+compute_flights = SingleFlight("compute", deadline_s=ANALYZE_DEADLINE_S)
+# Interactive results; prewarmed ones instead live until the next off-peak cycle (prewarm.warm_ttl)
+ANALYSIS_CACHE_TTL_S = int(os.getenv("ANALYSIS_CACHE_TTL_S", str(12 * 3600)))
+SEARCH_CACHE_TTL_S = int(os.getenv("SEARCH_CACHE_TTL_S", "600"))
+TICKER_META_TTL_S = 7 * 24 * 3600
+
+# Shared across worker processes when CACHE_BACKEND=sqlite (see cache.py)
+analysis_cache = get_cache("analysis", ttl=ANALYSIS_CACHE_TTL_S, max_entries=512)
+search_cache = get_cache("search", ttl=SEARCH_CACHE_TTL_S, max_entries=2048)
+scrape_prior_window.company_name_cache = get_cache("ticker_meta", ttl=TICKER_META_TTL_S, max_entries=4096)
 
 # ✅ Enable CORS
 app.add_middleware(
@@ -71,6 +108,12 @@ async def search_stocks(q: str = Query(..., min_length=1), limit: int = 20):
     """
     Search for stocks using Yahoo Finance, with fallback mock data if rate-limited.
     """
+    cache_key = f"{q.strip().lower()}|{limit}"
+    # Cache calls may hit SQLite (busy timeout under write contention), so keep them off the event loop
+    cached = await asyncio.to_thread(search_cache.get, cache_key)
+    if cached is not None:
+        return cached
+
     url = f"https://query2.finance.yahoo.com/v1/finance/search?q={q}"
     headers = {
         "User-Agent": (
@@ -106,41 +149,44 @@ async def search_stocks(q: str = Query(..., min_length=1), limit: int = 20):
 
     ]
 
-    for attempt in range(3):
-        try:
-            print(f"🌐 Attempt {attempt + 1}: Fetching {url}")
-            response = requests.get(url, headers=headers, timeout=5)
-
-            # Handle rate limit
-            if response.status_code == 429:
-                print("⚠️ Rate limited — waiting 2s before retry...")
-                time.sleep(2)
-                continue
-
-            response.raise_for_status()
-            data = response.json()
-            quotes = data.get("quotes", [])[:limit]
-
-            if not quotes:
-                print("⚠️ No quotes found, returning fallback")
-                return fallback
-
-            results = []
-            for item in quotes:
-                if "symbol" in item and "shortname" in item:
-                    results.append({
-                        "symbol": item["symbol"],
-                        "name": item["shortname"],
-                        "exchange": item.get("exchange", "N/A"),
-                        "type": item.get("quoteType", "N/A"),
-                    })
-
-            print(f"✅ Returning {len(results)} results to frontend")
-            return results
-
-        except Exception as e:
-            print(f"❌ Error on attempt {attempt + 1}: {e}")
-            time.sleep(1)
+    async def fetch():
+        response = await asyncio.to_thread(requests.get, url, headers=headers, timeout=5)
+        return resilience.check_response(response)
+
+    try:
+        # Rate-limited, backed off without blocking the event loop, hedged for tail latency
+        print(f"🌐 Fetching {url}")
+        response = await resilience.provider("yahoo").acall(
+            fetch,
+            retry_on=(requests.ConnectionError, requests.Timeout),
+            hedge_after=1.0,
+        )
+        response.raise_for_status()
+        data = response.json()
+        quotes = data.get("quotes", [])[:limit]
+
+        if not quotes:
+            print("⚠️ No quotes found, returning fallback")
+            return fallback
+
+        results = []
+        for item in quotes:
+            if "symbol" in item and "shortname" in item:
+                results.append({
+                    "symbol": item["symbol"],
+                    "name": item["shortname"],
+                    "exchange": item.get("exchange", "N/A"),
+                    "type": item.get("quoteType", "N/A"),
+                })
+
+        print(f"✅ Returning {len(results)} results to frontend")
+        await asyncio.to_thread(search_cache.set, cache_key, results)
+        return results
+
+    except resilience.CircuitOpenError:
+        print("🚨 Yahoo circuit open, returning fallback data")
+    except Exception as e:
+        print(f"❌ Error fetching from Yahoo: {e}")
 
     # If all attempts fail, use fallback
     print("🚨 Yahoo unreachable, returning fallback data")
@@ -160,111 +206,377 @@ async def get_analysis_stats():
         print("❌ ERROR fetching analysis stats:", e)
         return {"error": str(e)}
 
+def _summarize_analysis(doc: dict) -> dict:
+    """
+    The dashboard's view of an analysis document (used by /analysis/recent and pushed events).
+    """
+    prediction = (doc.get("prediction") or "").lower()
+
+    # ✅ Map prediction → recommendation
+    if prediction == "increase":
+        recommendation = "buy"
+    elif prediction == "decrease":
+        recommendation = "sell"
+    else:
+        recommendation = "hold"  # fallback if prediction missing or unclear
+
+    return {
+        "id": str(doc["_id"]),
+        "symbol": doc.get("ticker"),
+        "companyName": doc.get("company"),
+        "summary": doc.get("summary"),
+        "prediction": doc.get("prediction"),
+        "recommendation": recommendation,  # ✅ now derived from prediction
+        "keywords": doc.get("keywords"),
+        "isFavorite": doc.get("favorited", False),
+        "analysisDate": doc.get("created_at")
+    }
+
+
 @app.get("/analysis/recent")
-async def get_recent_analyses(limit: int = 10):
+async def get_recent_analyses(limit: int = RECENT_ANALYSES_LIMIT):
     try:
         cursor = collection.find().sort("created_at", DESCENDING).limit(limit)
-        results = []
-        for doc in cursor:
-            prediction = (doc.get("prediction") or "").lower()
-
-            # ✅ Map prediction → recommendation
-            if prediction == "increase":
-                recommendation = "buy"
-            elif prediction == "decrease":
-                recommendation = "sell"
-            else:
-                recommendation = "hold"  # fallback if prediction missing or unclear
-
-
-            results.append({
-                "id": str(doc["_id"]),
-                "symbol": doc.get("ticker"),
-                "companyName": doc.get("company"),
-                "summary": doc.get("summary"),
-                "prediction": doc.get("prediction"),
-                "recommendation": recommendation,  # ✅ now derived from prediction
-                "keywords": doc.get("keywords"),
-                "isFavorite": doc.get("favorited", False),
-                "analysisDate": doc.get("created_at")
-            })
-        return results
+        return [_summarize_analysis(doc) for doc in cursor]
     except Exception as e:
         print("❌ ERROR fetching recent analyses:", e)
         return {"error": str(e)}
 
-@app.post("/analyze")
-async def analyze(request: AnalysisRequest):
+def _analysis_key(symbol: str, start: str, end: str, fetch_text: bool = True) -> tuple:
+    """
+    Normalize a request into the key used to coalesce identical in-flight analyses.
+    """
+    symbol = (symbol or "").strip().upper()
     try:
-        data = request.model_dump()
-        print("📩 Received data from frontend:", data)
+        start = scrape_prior_window.parse_date(start).date().isoformat()
+        end = scrape_prior_window.parse_date(end).date().isoformat()
+    except ValueError:
+        pass  # let the pipeline report the bad date
+    return (symbol, start, end, (("fetch_text", fetch_text),))
+
+
+def _compute_analysis(symbol: str, start: str, end: str, fetch_text: bool = True,
+                      route: str = "/analyze", priority: Union[int, Priority] = INTERACTIVE,
+                      cancel: Optional[CancelToken] = None) -> dict:
+    """
+    The expensive part of /analyze (scraper + Gemini). Results are cached so repeated and
+    pre-warmed windows skip it entirely.
+    """
+    cache_key = repr(_analysis_key(symbol, start, end, fetch_text))
+    cached = analysis_cache.get(cache_key)
+    if cached is not None:
+        print(f"⚡ Analysis cache hit for {cache_key}")
+        return cached
+
+    # --- 1️⃣ Run the scraper and get its JSON result ---
+    # Only keep (and keep fetching) as much text as the prompts can use; a char is at least one byte
+    result_data = scrape_prior_window.run_scraper(
+        symbol, start, end, fetch_text=fetch_text, cancel=cancel,
+        max_text_bytes=PROMPT_ARTICLES_MAX_CHARS, max_chars_per_article=PROMPT_ARTICLE_TEXT_CHARS,
+    )
+
+    print("🧠 Scraper finished. Now running Gemini analyzer...")
+
+    # --- 2️⃣ Analyze result_data with Gemini ---
+    analysis_output = analyze_articles(result_data, route=route, priority=priority, cancel=cancel)
+
+    computed = {"result_data": result_data, "analysis_output": analysis_output}
+    if "error" not in analysis_output:
+        ttl = warm_ttl(datetime.now(timezone.utc)) if route == "prewarm" else None
+        analysis_cache.set(cache_key, computed, ttl=ttl)
+    return computed
+
+
+def _record_analysis(computed: dict) -> dict:
+    result_data = computed["result_data"]
+    analysis_output = computed["analysis_output"]
+
+    # --- 3️⃣ Build final structured Mongo document ---
+    mongo_doc = {
+        "ticker": result_data.get("ticker"),
+        "company": result_data.get("company"),
+        "start_date": result_data.get("start_date"),
+        "end_date": result_data.get("end_date"),
+        "net_gain": result_data.get("net_gain"),
+        "label": result_data.get("label"),
+        "prediction": analysis_output.get("prediction"),
+        "created_at": datetime.now(timezone.utc).isoformat(),  # ISO 8601 UTC timestamp
+        "favorited": False,  # all start as not favorited
+        "summary": analysis_output.get("summary"),
+        "keywords": analysis_output.get("keywords"),
+        "articles": result_data.get("articles"),
+    }
+
+    mongo_doc["summary"] = {
+        "recommendation": analysis_output.get("prediction", "hold"),
+        "confidence": 85,  # static or model-based
+        "explanation": analysis_output.get("summary", ""),
+        "keyFactors": analysis_output.get("keywords", []),
+    }
+
+    mongo_doc["analysisPeriod"] = {
+        "startDate": result_data.get("start_date"),
+        "endDate": result_data.get("end_date"),
+    }
+
+    mongo_doc["webScrapingResults"] = {
+        "totalArticles": len(result_data.get("articles", [])),
+        "sentimentTrend": result_data.get("label", "neutral"),
+        "keyTopics": analysis_output.get("keywords", []),
+    }
+
+    mongo_doc["trendAnalysis"] = {
+        "similarHistoricalEvents": []  # can fill later if you add pattern matching
+    }
+
+    # --- 4️⃣ Save to MongoDB ---
+    insert_result = collection.insert_one(mongo_doc)
+    mongo_doc["_id"] = str(insert_result.inserted_id)
+
+    emit({"type": "analysis.created", "analysis": _summarize_analysis(mongo_doc)})
+    emit({"type": "stats.delta", "totalAnalyses": 1, "favoriteStocks": 0})
+
+    return mongo_doc
+
+
+async def _compute_shared(symbol: str, start: str, end: str,
+                          route: str = "/analyze", priority: int = INTERACTIVE) -> dict:
+    # Interactive requests and the prewarm scheduler share one computation per window; an interactive
+    # caller joining a prewarm run raises its priority so it isn't served at batch priority
+    key = _analysis_key(symbol, start, end)
+    shared_priority = Priority(priority)
+    return await compute_flights.do(
+        key, lambda token: asyncio.get_running_loop().run_in_executor(
+            pipeline_executor, _compute_analysis, symbol, start, end, True, route, shared_priority, token
+        ),
+        priority=shared_priority,
+    )
+
+
+async def _analyze_and_record(symbol: str, start: str, end: str, cancel: CancelToken) -> dict:
+    computed = await _compute_shared(symbol, start, end)
+    cancel.raise_if_cancelled()  # don't save a document nobody will read
+    return await asyncio.to_thread(_record_analysis, computed)
+
+
+async def _cancel_on_disconnect(http_request: Request, work: asyncio.Future) -> bool:
+    """
+    Cancel `work` if the client goes away; returns True if it did, so the caller can tell that
+    cancellation apart from its own.
+    """
+    while not work.done():
+        if await http_request.is_disconnected():
+            print("🛑 Client disconnected, abandoning analysis")
+            work.cancel()
+            return True
+        await asyncio.sleep(DISCONNECT_POLL_S)
+    return False
+
+
+async def _prewarm_window(ticker: str, start: str, end: str) -> bool:
+    if await asyncio.to_thread(analysis_cache.has, repr(_analysis_key(ticker, start, end))):
+        return False
+    await _compute_shared(ticker, start, end, route="prewarm", priority=BATCH)
+    return True
 
-        # Run the scraper synchronously and get its JSON result
-        result_data = scrape_prior_window.run_scraper(
-            data["symbol"],
-            data["startDate"],
-            data["endDate"]
+
+prewarm_scheduler = PrewarmScheduler(collection, _prewarm_window, lease=get_cache("prewarm", ttl=60))
+
+
+@app.on_event("startup")
+async def start_prewarm():
+    prewarm_scheduler.start()
+
+
+# ---------- LIVE UPDATES ----------
+class FavoriteUpdate(BaseModel):
+    favorited: bool
+
+
+def _favorite_events(analysis_id: str, favorited: bool) -> list:
+    return [
+        {"type": "analysis.favorited", "id": analysis_id, "isFavorite": favorited},
+        {"type": "stats.delta", "totalAnalyses": 0, "favoriteStocks": 1 if favorited else -1},
+    ]
+
+
+def _change_to_events(change: dict) -> list:
+    if change["operationType"] == "insert":
+        return [
+            {"type": "analysis.created", "analysis": _summarize_analysis(change["fullDocument"])},
+            {"type": "stats.delta", "totalAnalyses": 1, "favoriteStocks": 0},
+        ]
+    updated = change.get("updateDescription", {}).get("updatedFields", {})
+    if "favorited" in updated:
+        return _favorite_events(str(change["documentKey"]["_id"]), bool(updated["favorited"]))
+    return []
+
+
+@app.on_event("startup")
+async def start_event_bus():
+    bus.bind(asyncio.get_running_loop())
+    watch_change_stream(collection, _change_to_events)
+
+
+@app.patch("/analysis/{analysis_id}/favorite")
+async def set_favorite(analysis_id: str, update: FavoriteUpdate):
+    try:
+        # Only matches when the value actually changes, so stats deltas stay exact
+        result = await asyncio.to_thread(
+            collection.update_one,
+            {"_id": ObjectId(analysis_id), "favorited": {"$ne": update.favorited}},
+            {"$set": {"favorited": update.favorited}},
         )
+        if result.modified_count:
+            for event in _favorite_events(analysis_id, update.favorited):
+                emit(event)
+        return {"id": analysis_id, "isFavorite": update.favorited}
+    except Exception as e:
+        print("❌ ERROR updating favorite:", e)
+        return {"error": str(e)}
 
-        print("🧠 Scraper finished. Now running Gemini analyzer...")
-
-        # --- 2️⃣ Analyze result_data with Gemini ---
-        analysis_output = analyze_articles(result_data)
-
-        # --- 3️⃣ Build final structured Mongo document ---
-        mongo_doc = {
-            "ticker": result_data.get("ticker"),
-            "company": result_data.get("company"),
-            "start_date": result_data.get("start_date"),
-            "end_date": result_data.get("end_date"),
-            "net_gain": result_data.get("net_gain"),
-            "label": result_data.get("label"),
-            "prediction": analysis_output.get("prediction"),
-            "created_at": datetime.now(timezone.utc).isoformat(),  # ISO 8601 UTC timestamp
-            "favorited": False,  # all start as not favorited
-            "summary": analysis_output.get("summary"),
-            "keywords": analysis_output.get("keywords"),
-            "articles": result_data.get("articles"),
-        }
 
-        mongo_doc["summary"] = {
-            "recommendation": analysis_output.get("prediction", "hold"),
-            "confidence": 85,  # static or model-based
-            "explanation": analysis_output.get("summary", ""),
-            "keyFactors": analysis_output.get("keywords", []),
-        }
+def _snapshot_event(limit: int = RECENT_ANALYSES_LIMIT) -> dict:
+    """
+    Baseline sent to each live-update subscriber before any deltas, so clients that (re)connect
+    never apply deltas to stale counters.
+    """
+    cursor = collection.find().sort("created_at", DESCENDING).limit(limit)
+    return {
+        "type": "snapshot",
+        "analyses": [_summarize_analysis(doc) for doc in cursor],
+        "totalAnalyses": collection.count_documents({}),
+        "favoriteStocks": collection.count_documents({"favorited": True}),
+    }
 
-        mongo_doc["analysisPeriod"] = {
-            "startDate": result_data.get("start_date"),
-            "endDate": result_data.get("end_date"),
-        }
 
-        mongo_doc["webScrapingResults"] = {
-            "totalArticles": len(result_data.get("articles", [])),
-            "sentimentTrend": result_data.get("label", "neutral"),
-            "keyTopics": analysis_output.get("keywords", []),
-        }
+@app.websocket("/ws/analyses")
+async def analyses_socket(websocket: WebSocket):
+    await websocket.accept()
+    # Subscribe before taking the snapshot: a change racing it may be counted twice, but is never lost
+    queue = bus.subscribe()
+    try:
+        snapshot = await asyncio.to_thread(_snapshot_event)
+        await websocket.send_text(orjson.dumps(snapshot).decode())
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), EVENT_KEEPALIVE_S)
+            except asyncio.TimeoutError:
+                event = {"type": "ping"}  # also how we notice clients that vanished silently
+            await websocket.send_text(orjson.dumps(event).decode())
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        bus.unsubscribe(queue)
+
+
+@app.get("/analysis/events")
+async def analyses_event_stream(http_request: Request):
+    queue = bus.subscribe()
+
+    async def stream():
+        try:
+            snapshot = await asyncio.to_thread(_snapshot_event)
+            yield b"data: " + orjson.dumps(snapshot) + b"\n\n"
+            while not await http_request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), EVENT_KEEPALIVE_S)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                yield b"data: " + orjson.dumps(event) + b"\n\n"
+        finally:
+            bus.unsubscribe(queue)
 
-        mongo_doc["trendAnalysis"] = {
-            "similarHistoricalEvents": []  # can fill later if you add pattern matching
-        }
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
-        # --- 4️⃣ Save to MongoDB ---
-        insert_result = collection.insert_one(mongo_doc)
-        mongo_doc["_id"] = str(insert_result.inserted_id)
 
-        # --- 5️⃣ (Optional) Save to local file for debugging ---
-        out_path = Path("last_result.json")
-        with out_path.open("w", encoding="utf-8") as f:
-            json.dump(mongo_doc, f, indent=2, ensure_ascii=False)
+@app.on_event("shutdown")
+async def stop_prewarm():
+    prewarm_scheduler.stop()
 
-        # --- 6️⃣ Return response ---
-        return {
+
+# ---------- ADMIN ----------
+def require_admin(x_admin_token: str = Header(default="")):
+    # Admin endpoints are disabled unless ADMIN_TOKEN is set
+    if not ADMIN_TOKEN or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+@app.on_event("startup")
+async def start_profiling():
+    if TRACEMALLOC_ON_STARTUP:
+        profiling.start_tracemalloc()
+
+
+@app.get("/admin/llm/stats", dependencies=[Depends(require_admin)])
+async def get_llm_stats():
+    return gateway.stats()
+
+
+@app.get("/admin/profile/memory", dependencies=[Depends(require_admin)])
+async def get_memory_profile(limit: int = 20):
+    report = await asyncio.to_thread(profiling.memory_report, limit)
+    report["budgets"] = {
+        "articleTextBytes": scrape_prior_window.ARTICLE_TEXT_BUDGET_BYTES,
+        "maxArticles": scrape_prior_window.MAX_ARTICLES_PER_REQUEST,
+    }
+    return report
+
+
+@app.post("/admin/profile/tracemalloc", dependencies=[Depends(require_admin)])
+async def toggle_tracemalloc(enable: bool = True, frames: int = 10):
+    if enable:
+        profiling.start_tracemalloc(frames)
+    else:
+        profiling.stop_tracemalloc()
+    return {"tracing": enable}
+
+
+@app.get("/admin/profile/cpu", dependencies=[Depends(require_admin)])
+async def get_cpu_profile(seconds: float = Query(5.0, gt=0, le=60), limit: int = 25):
+    return await asyncio.to_thread(profiling.sample_stacks, seconds, 0.01, limit)
+
+
+@app.post("/analyze")
+async def analyze(request: AnalysisRequest, http_request: Request, background_tasks: BackgroundTasks):
+    watcher = None
+    try:
+        data = request.model_dump()
+        print("📩 Received data from frontend:", data)
+
+        # Concurrent requests for the same window share one scraper + Gemini run (and one saved document).
+        # If this client disconnects we stop waiting; once every waiter is gone the shared run is cancelled.
+        key = _analysis_key(data["symbol"], data["startDate"], data["endDate"])
+        work = asyncio.ensure_future(analysis_flights.do(
+            key,
+            lambda token: _analyze_and_record(data["symbol"], data["startDate"], data["endDate"], token),
+        ))
+        watcher = asyncio.create_task(_cancel_on_disconnect(http_request, work))
+        try:
+            mongo_doc = await work
+        finally:
+            watcher.cancel()
+            work.cancel()  # no-op if finished; releases our waiter slot if this handler itself was cancelled
+
+        # --- 5️⃣ (Optional) Save to local file for debugging, after the response is sent ---
+        if should_dump():
+            background_tasks.add_task(write_debug_dump, mongo_doc)
+
+        # --- 6️⃣ Return response (ORJSONResponse directly, skipping jsonable_encoder) ---
+        return ORJSONResponse({
             "status": "success",
             "data": mongo_doc,
-            "inserted_id": str(insert_result.inserted_id),
-        }
-
+            "inserted_id": mongo_doc["_id"],
+        })
+
+    except asyncio.CancelledError:
+        if watcher is not None and watcher.done() and not watcher.cancelled() and watcher.result():
+            return {"error": "Analysis cancelled: client disconnected"}
+        raise  # the handler itself was cancelled (e.g. server shutdown); let it propagate
+    except (asyncio.TimeoutError, Cancelled):
+        print(f"⏱️ Analysis for {data.get('symbol')} exceeded {ANALYZE_DEADLINE_S:.0f}s deadline")
+        return {"error": "Analysis timed out"}
     except Exception as e:
         import traceback
         traceback.print_exc()
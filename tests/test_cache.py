@@ -0,0 +1,143 @@
+import time
+
+import pytest
+
+from cache import CacheBackend, MemoryCache, SQLiteCache
+
+TTL = 0.2
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_cache(request, tmp_path):
+    def make(namespace="test", ttl=60.0, max_entries=1024):
+        if request.param == "memory":
+            return MemoryCache(namespace, ttl, max_entries)
+        return SQLiteCache(namespace, ttl, max_entries, path=str(tmp_path / "cache.sqlite3"))
+    return make
+
+
+def test_get_set_roundtrip(make_cache):
+    cache = make_cache()
+    assert cache.get("missing") is None
+    cache.set("k", {"a": [1, 2]})
+    assert cache.get("k") == {"a": [1, 2]}
+    cache.set("k", "replaced")
+    assert cache.get("k") == "replaced"
+
+
+def test_entries_expire(make_cache):
+    cache = make_cache(ttl=TTL)
+    cache.set("default", 1)
+    cache.set("longer", 2, ttl=60)
+    time.sleep(TTL * 1.5)
+    assert cache.get("default") is None
+    assert cache.get("longer") == 2
+
+
+def test_has_and_contains(make_cache):
+    cache = make_cache(ttl=TTL)
+    assert not cache.has("k")
+    cache.set("k", 0)  # falsy values still exist
+    assert cache.has("k") and "k" in cache
+    time.sleep(TTL * 1.5)
+    assert "k" not in cache
+
+
+def test_delete(make_cache):
+    cache = make_cache()
+    cache.set("k", 1)
+    cache.delete("k")
+    cache.delete("never-set")
+    assert cache.get("k") is None
+
+
+def test_add_only_sets_absent_or_expired_keys(make_cache):
+    cache = make_cache()
+    assert cache.add("lease", "a", ttl=TTL)
+    assert not cache.add("lease", "b", ttl=TTL)
+    assert cache.get("lease") == "a"
+    time.sleep(TTL * 1.5)
+    assert cache.add("lease", "c", ttl=TTL)
+    assert cache.get("lease") == "c"
+
+
+def test_incr_counts_and_restarts_after_expiry(make_cache):
+    cache = make_cache()
+    assert cache.incr("n", ttl=TTL) == 1
+    assert cache.incr("n", ttl=TTL) == 2
+    assert cache.incr("n", -1, ttl=TTL) == 1
+    assert cache.get("n") == 1
+    time.sleep(TTL * 1.5)
+    assert cache.incr("n", 5, ttl=TTL) == 5
+
+
+def test_incr_does_not_refresh_ttl(make_cache):
+    cache = make_cache()
+    cache.incr("n", ttl=TTL)
+    time.sleep(TTL * 0.6)
+    cache.incr("n", ttl=TTL)
+    time.sleep(TTL * 0.6)
+    assert cache.get("n") is None
+
+
+def test_namespaces_are_isolated(make_cache):
+    a, b = make_cache("a"), make_cache("b")
+    a.set("k", "from a")
+    assert b.get("k") is None
+    assert b.add("k", "from b")
+    assert a.get("k") == "from a"
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache("lru", ttl=60, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # b is now the least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_memory_cache_has_does_not_touch_lru_order():
+    cache = MemoryCache("lru", ttl=60, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.has("a")
+    cache.set("c", 3)
+    assert cache.get("a") is None
+
+
+def test_sqlite_cache_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "shared.sqlite3")
+    first, second = SQLiteCache("ns", 60, path=path), SQLiteCache("ns", 60, path=path)
+    first.set("k", [1, 2, 3])
+    assert second.get("k") == [1, 2, 3]
+    assert first.add("lease", 1)
+    assert not second.add("lease", 2)
+    first.incr("spent")
+    assert second.incr("spent") == 2
+
+
+def test_sqlite_cache_prunes_to_max_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(SQLiteCache, "PRUNE_EVERY", 5)
+    cache = SQLiteCache("ns", 60, max_entries=3, path=str(tmp_path / "prune.sqlite3"))
+    cache.set("expired", 0, ttl=0.01)
+    time.sleep(0.05)
+    for i in range(4):
+        cache.set(f"k{i}", i, ttl=60 + i)  # later keys expire later, so they are the ones kept
+    assert cache.get("k0") is None
+    assert [cache.get(f"k{i}") for i in range(1, 4)] == [1, 2, 3]
+    count = cache._conn().execute("SELECT COUNT(*) FROM cache WHERE ns = 'ns'").fetchone()[0]
+    assert count == 3
+
+
+def test_incomplete_backend_fails_at_construction():
+    class NoCounter(CacheBackend):
+        def get(self, key): return None
+        def set(self, key, value, ttl=None): pass
+        def add(self, key, value, ttl=None): return True
+        def delete(self, key): pass
+        def has(self, key): return False
+
+    with pytest.raises(TypeError):
+        NoCounter("ns", 60)
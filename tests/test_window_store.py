@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from scripts.window_store import WindowStore
+
+
+def window(ticker, start, end, **extra):
+    return {"ticker": ticker, "start_date": start, "end_date": end, "articles": [], **extra}
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = WindowStore(tmp_path / "windows")
+    yield s
+    s.close()
+
+
+def test_append_and_read_back(store):
+    entry = store.append(window("tsla", "2025-10-20", "2025-10-27", label="up"))
+    assert entry["ticker"] == "TSLA"
+    assert store.read(entry)["label"] == "up"
+    assert store.query("TSLA") == [entry]
+
+
+def test_query_filters_by_ticker_and_overlap(store):
+    store.append(window("TSLA", "2025-01-01", "2025-01-07"))
+    store.append(window("TSLA", "2025-02-01", "2025-02-07"))
+    store.append(window("AAPL", "2025-01-03", "2025-01-10"))
+
+    assert len(store.query()) == 3
+    assert [e["start_date"] for e in store.query("tsla", start="2025-01-05")] == ["2025-01-01", "2025-02-01"]
+    assert [e["start_date"] for e in store.query("TSLA", end="2025-01-31")] == ["2025-01-01"]
+    assert [e["ticker"] for e in store.query(start="2025-01-08", end="2025-01-31")] == ["AAPL"]
+
+
+def test_shards_roll_over(tmp_path):
+    store = WindowStore(tmp_path / "windows", shard_max_bytes=200)
+    entries = [store.append(window("T", f"2025-01-{d:02d}", "2025-02-01", pad="x" * 100)) for d in range(1, 6)]
+    assert len({e["shard"] for e in entries}) > 1
+    assert [store.read(e)["start_date"] for e in entries] == [f"2025-01-{d:02d}" for d in range(1, 6)]
+    assert len(list(store.iter_records())) == 5
+    store.close()
+
+
+def test_reappending_a_window_supersedes_the_earlier_copy(store):
+    store.append(window("TSLA", "2025-01-01", "2025-01-07", version=1))
+    store.append(window("AAPL", "2025-01-01", "2025-01-07", version=1))
+    store.append(window("tsla", "2025-01-01", "2025-01-07", version=2))
+
+    assert [(e["ticker"], store.read(e)["version"]) for e in store.query()] == [("AAPL", 1), ("TSLA", 2)]
+    assert [r["version"] for r in store.iter_records(ticker="TSLA")] == [2]
+    assert sorted((r["ticker"].upper(), r["version"]) for r in store.iter_records()) == [("AAPL", 1), ("TSLA", 2)]
+
+
+def test_index_picks_up_appends_from_other_writers(tmp_path):
+    reader, writer = WindowStore(tmp_path / "windows"), WindowStore(tmp_path / "windows")
+    assert reader.query() == []
+    writer.append(window("TSLA", "2025-01-01", "2025-01-07"))
+    assert len(reader.query()) == 1
+
+
+def test_partially_written_index_line_is_skipped_until_complete(store):
+    store.append(window("TSLA", "2025-01-01", "2025-01-07"))
+    entry = json.dumps({"ticker": "AAPL", "start_date": "2025-01-01", "end_date": "2025-01-07",
+                        "shard": "shard-00000.jsonl", "offset": 0, "length": 1})
+    with open(store.index_path, "a") as f:
+        f.write(entry[:10])
+    assert len(store.query()) == 1
+    with open(store.index_path, "a") as f:
+        f.write(entry[10:] + "\n")
+    assert len(store.query()) == 2